@@ -1,89 +1,141 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import polars as pl
+from numba import njit
 import plotly.express as px
-import time
+import plotly.graph_objects as go
+from data import load_data  # shared with other pages so they hit one cache
 
 # --- PAGE CONFIG ---
 st.set_page_config(page_title="Machine Ops & Costing", layout="wide")
-# --- CONFIGURATION ---
-# We use the 'export' endpoint, not the 'edit' endpoint
-SHEET_ID = "1S8ECq792lFD4dsfhUiHpK1pycx_uEZePi_qlj3ZpQ_c"
-SHEET_GID = "109996351" # e.g., "154826493" (Found in browser URL when on activity_raw tab)
-
-SHEET_CSV_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/export?format=csv&gid={SHEET_GID}"
-
-# --- 2. SIDEBAR (The "Wafeq" Controls) ---
-st.sidebar.header("💰 Rate Card Configuration")
-st.sidebar.write("Set your billing rates to calculate daily value.")
-
-rate_m1 = st.sidebar.number_input("Machine 1 Rate (PKR/hr)", value=5000, step=500)
-rate_m2 = st.sidebar.number_input("Machine 2 Rate (PKR/hr)", value=3500, step=500)
-
-# Filter for "Billable" activities
-billable_activities = st.sidebar.multiselect(
-    "Billable Activities",
-    ["Running", "Setup", "Maintenance", "Idle"],
-    default=["Running", "Setup"]
-)
-
-# --- 3. DATA LOADER ---
-@st.cache_data(ttl=60)
-def load_data():
-    try:
-        df = pd.read_csv(SHEET_CSV_URL)
-        # Clean headers
-        df.columns = df.columns.str.strip().str.lower().str.replace(' ', '_')
-        
-        # Robust Time Parsing
-        df['start_time'] = pd.to_datetime(df['start_time'], dayfirst=True, format='mixed', errors='coerce')
-        df['end_time'] = pd.to_datetime(df['end_time'], dayfirst=True, format='mixed', errors='coerce')
-
-        # Drop bad rows
-        df = df.dropna(subset=['start_time', 'end_time'])
-
-        # Data Enrichment
-        # Ensure machine_id is string and handle duplicates/formatting
-        df['machine_id'] = df['machine_id'].astype(str).str.replace('Machine ', '', regex=False)
-        df['machine_label'] = "Machine " + df['machine_id'] 
-        
-        # Calculate Duration
-        df['duration_hrs'] = (df['end_time'] - df['start_time']).dt.total_seconds() / 3600
-        df['duration_min'] = df['duration_hrs'] * 60
-        
-        return df
-    except Exception as e:
-        st.error(f"Data Error: {e}")
-        return pd.DataFrame()
-
-# --- 4. MAIN DASHBOARD ---
-df = load_data()
 
-if not df.empty:
-    st.title("🏭 Manufacturing Analytics")
-    
+# Timeline styling
+COLOR_MAP = {
+    "Running": "#2ecc71", "Idle": "#f1c40f", 
+    "Setup": "#3498db", "Breakdown": "#e74c3c", "Off": "#95a5a6"
+}
+# HOVER INFO
+HOVER_DATA = {"remark": True, "submitted_by": True, "cost_pkr": ':.0f', "machine_label": False}
+
+# Columns shown in the financial breakdown table
+TABLE_COLS = ['timestamp', 'machine_label', 'activity_type', 'duration_min', 'cost_pkr', 'remark']
+
+# --- 2. COST & TIMELINE HELPERS ---
+@njit(cache=True)
+def calculate_costs(act, mach, hrs, billable, rates):
+    # One fused pass; code -1 (missing category) is never billed
+    out = np.empty_like(hrs)
+    for i in range(hrs.size):
+        a = act[i]
+        m = mach[i]
+        if a >= 0 and m >= 0 and billable[a]:
+            out[i] = hrs[i] * rates[m]
+        else:
+            out[i] = 0.0
+    return out
+
+def coalesce_timeline(df):
+    # Merge back-to-back rows of the same activity on the same machine into one bar
+    df = df.sort_values(['machine_label', 'start_time'])
+    prev = df.shift()
+    # Work on plain NumPy so Arrow-typed timestamps don't leak bool[pyarrow] masks
+    new_run = (
+        (df['activity_type'] != prev['activity_type']).to_numpy(dtype=bool)
+        | (df['machine_label'] != prev['machine_label']).to_numpy(dtype=bool)
+    )
+    run = new_run.cumsum()
+    # Compare against the running end of the run so far, so a short bar nested
+    # inside a longer one of the same activity doesn't start a new group
+    end = pd.Series(df['end_time'].to_numpy('datetime64[ns]'), index=df.index)
+    run_end = end.groupby(run).cummax().groupby(run).shift()
+    gap = (df['start_time'].to_numpy('datetime64[ns]') > run_end.to_numpy())
+    new_group = new_run | gap
+    return df.groupby(new_group.cumsum(), sort=False).agg(
+        start_time=('start_time', 'min'),
+        end_time=('end_time', 'max'),
+        machine_label=('machine_label', 'first'),
+        activity_type=('activity_type', 'first'),
+        cost_pkr=('cost_pkr', 'sum'),
+        remark=('remark', 'first'),
+        submitted_by=('submitted_by', 'first'),
+    )
+
+# cost_pkr already reflects the rate card and billable filter, so hashing the
+# frame is enough to key the figure on every input that changes it; only a
+# few recent figures are kept
+@st.cache_data(show_spinner=False, max_entries=8, hash_funcs={
+    pd.DataFrame: lambda d: pd.util.hash_pandas_object(d, index=True).values.tobytes()
+})
+def build_timeline(df):
+    fig = px.timeline(
+        coalesce_timeline(df),
+        x_start="start_time", 
+        x_end="end_time", 
+        y="machine_label",
+        color="activity_type",
+        hover_data=HOVER_DATA,
+        color_discrete_map=COLOR_MAP
+    )
+    fig.update_yaxes(autorange="reversed")
+    return fig.to_dict()
+
+# --- 3. MAIN DASHBOARD ---
+# Rate card widgets live inside the fragment (fragments can't write to the
+# sidebar), so changing a rate reruns only this block, not the whole page
+@st.fragment
+def render_dashboard(df):
+    # --- RATE CARD (The "Wafeq" Controls) ---
+    with st.expander("💰 Rate Card Configuration", expanded=True):
+        st.write("Set your billing rates to calculate daily value.")
+        c1, c2, c3 = st.columns(3)
+        rate_m1 = c1.number_input("Machine 1 Rate (PKR/hr)", value=5000, step=500)
+        rate_m2 = c2.number_input("Machine 2 Rate (PKR/hr)", value=3500, step=500)
+
+        # Filter for "Billable" activities
+        billable_activities = c3.multiselect(
+            "Billable Activities",
+            ["Running", "Setup", "Maintenance", "Idle"],
+            default=["Running", "Setup"]
+        )
+
     # --- COST CALCULATION ENGINE ---
-    def calculate_cost(row):
-        # 1. Check if activity is billable
-        if row['activity_type'] not in billable_activities:
-            return 0.0
-        
-        # 2. Apply Rate based on Machine ID
-        if '1' in str(row['machine_id']):
-            return row['duration_hrs'] * rate_m1
-        elif '2' in str(row['machine_id']):
-            return row['duration_hrs'] * rate_m2
-        return 0.0
-
-    df['cost_pkr'] = df.apply(calculate_cost, axis=1)
+    # Lookup tables are per category (a handful of entries), the kernel does the rows
+    # 1. Check if activity is billable
+    billable_set = frozenset(billable_activities)
+    billable = np.array([c in billable_set for c in df['activity_type'].cat.categories], dtype=np.bool_)
+
+    # 2. Apply Rate based on Machine ID
+    rate_map = {'1': rate_m1, '2': rate_m2}
+    rates = np.array([rate_map.get(c, 0.0) for c in df['machine_id'].cat.categories], dtype=np.float64)
+
+    df['cost_pkr'] = calculate_costs(
+        df['activity_type'].cat.codes.to_numpy(),
+        df['machine_id'].cat.codes.to_numpy(),
+        df['duration_hrs'].to_numpy(dtype=np.float64),
+        billable,
+        rates,
+    )
+
     # --- TOP METRICS ---
-    total_rev = df['cost_pkr'].sum()
-    
-    # 1. Calculate Total Time Logged (The denominator)
-    total_logged_hrs = df['duration_hrs'].sum()
-    
-    # 2. Calculate "Value Added" Time (The numerator)
-    # We only count "Running" as productive time. Setup/Idle is lost time.
-    running_hrs = df[df['activity_type'] == 'Running']['duration_hrs'].sum()
+    # One fused Polars scan instead of separate pandas passes
+    metrics = (
+        pl.from_pandas(df[['cost_pkr', 'duration_hrs', 'activity_type']])
+        .lazy()
+        .select(
+            pl.col('cost_pkr').sum().alias('total_rev'),
+            # 1. Calculate Total Time Logged (The denominator)
+            pl.col('duration_hrs').sum().alias('total_logged_hrs'),
+            # 2. Calculate "Value Added" Time (The numerator)
+            # We only count "Running" as productive time. Setup/Idle is lost time.
+            pl.col('duration_hrs').filter(pl.col('activity_type') == 'Running').sum().alias('running_hrs'),
+        )
+        .collect()
+        .row(0, named=True)
+    )
+    total_rev = metrics['total_rev']
+    total_logged_hrs = metrics['total_logged_hrs']
+    running_hrs = metrics['running_hrs']
     
     # 3. Calculate The Percentage
     if total_logged_hrs > 0:
@@ -102,27 +154,20 @@ if not df.empty:
 
     # --- TIMELINE VISUALIZATION ---
     st.subheader("Activity Timeline")
-    fig = px.timeline(
-        df, 
-        x_start="start_time", 
-        x_end="end_time", 
-        y="machine_label",
-        color="activity_type",
-        # HOVER INFO
-        hover_data={"remark": True, "submitted_by": True, "cost_pkr": ':.0f', "machine_label": False},
-        color_discrete_map={
-            "Running": "#2ecc71", "Idle": "#f1c40f", 
-            "Setup": "#3498db", "Breakdown": "#e74c3c", "Off": "#95a5a6"
-        }
-    )
-    fig.update_yaxes(autorange="reversed")
+    fig = go.Figure(build_timeline(df))
     st.plotly_chart(fig, use_container_width=True)
 
     # --- DETAILED COST TABLE ---
     with st.expander("View Financial Breakdown"):
         # Filter purely for the table view
-        billable_df = df[df['cost_pkr'] > 0][['timestamp', 'machine_label', 'activity_type', 'duration_min', 'cost_pkr', 'remark']]
+        billable_df = df.loc[df['cost_pkr'].to_numpy() > 0, TABLE_COLS]
         st.dataframe(billable_df.style.format({"cost_pkr": "PKR {:.2f}", "duration_min": "{:.1f} min"}))
 
+df = load_data()
+
+if not df.empty:
+    st.title("🏭 Manufacturing Analytics")
+    render_dashboard(df)
+
 else:
     st.info("Waiting for data... Please submit a form entry.")
@@ -0,0 +1,144 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import io
+import os
+import tempfile
+import hashlib
+import requests
+
+# --- CONFIGURATION ---
+# We use the 'export' endpoint, not the 'edit' endpoint
+SHEET_ID = "1S8ECq792lFD4dsfhUiHpK1pycx_uEZePi_qlj3ZpQ_c"
+SHEET_GID = "109996351" # e.g., "154826493" (Found in browser URL when on activity_raw tab)
+
+SHEET_CSV_URL = f"https://docs.google.com/spreadsheets/d/{SHEET_ID}/export?format=csv&gid={SHEET_GID}"
+
+# --- DATA LOADER ---
+CACHE_DIR = os.path.dirname(os.path.abspath(__file__))
+PARQUET_CACHE = os.path.join(CACHE_DIR, 'cache.parquet')
+PARQUET_META = os.path.join(CACHE_DIR, 'cache.meta')
+# Bump whenever parse_csv changes the frame it builds, so stale caches are ignored
+CACHE_VERSION = 1
+
+# Google Forms writes dd/mm/yyyy; fixed formats hit pandas' vectorized fast path
+TIME_FORMATS = ['%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M']
+
+# Cheap prefilter: anything shaped like a numeric date (dd/mm/yyyy, yyyy-mm-dd)
+DATE_PATTERN = r'\s*\d{1,4}[/-]\d{1,2}[/-]\d{1,4}'
+
+USED_COLS = {'timestamp', 'start_time', 'end_time', 'machine_id', 'activity_type', 'remark', 'submitted_by'}
+
+def clean_header(name):
+    return name.strip().lower().replace(' ', '_')
+
+def parse_times(col):
+    parsed = pd.to_datetime(col, format=TIME_FORMATS[0], errors='coerce')
+    for fmt in TIME_FORMATS[1:]:
+        parsed = parsed.fillna(pd.to_datetime(col, format=fmt, errors='coerce'))
+    # Only hand-typed oddities fall through to the slow per-row parser
+    leftover = parsed.isna() & col.notna()
+    if leftover.any():
+        parsed[leftover] = pd.to_datetime(col[leftover], dayfirst=True, format='mixed', errors='coerce')
+    return parsed
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_csv():
+    resp = requests.get(SHEET_CSV_URL, timeout=30)
+    resp.raise_for_status()
+    return resp.content
+
+# Keyed on the content hash only, so unchanged bytes skip parsing entirely.
+# The parsed frame is also kept on disk as Parquet, so after a restart an
+# unchanged sheet is restored with native types instead of re-parsed.
+# Only the current sheet version is kept in memory
+@st.cache_data(show_spinner=False, max_entries=1)
+def transform(_raw, sig):
+    key = f"v{CACHE_VERSION}:{sig}"
+    try:
+        with open(PARQUET_META) as f:
+            if f.read() == key:
+                return pd.read_parquet(PARQUET_CACHE)
+    except Exception:
+        pass  # missing or unreadable cache: fall through to a fresh parse
+
+    df = parse_csv(_raw)
+    try:
+        write_atomic(PARQUET_CACHE, lambda path: df.to_parquet(path))
+        # Meta goes last, so it never vouches for a half-written Parquet file
+        write_atomic(PARQUET_META, lambda path: write_text(path, key))
+    except Exception:
+        pass  # the cache is only an optimisation; never fail a good parse
+    return df
+
+def write_text(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+def write_atomic(dest, write):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(dest), suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+def parse_csv(raw):
+    # Only parse the columns the dashboard actually uses
+    header = pd.read_csv(io.BytesIO(raw), nrows=0).columns
+    usecols = [c for c in header if clean_header(c) in USED_COLS]
+    df = pd.read_csv(io.BytesIO(raw), engine="pyarrow", dtype_backend="pyarrow", usecols=usecols)
+    # Clean headers
+    df.columns = [clean_header(c) for c in df.columns]
+    
+    # Robust Time Parsing (skip if pyarrow already inferred timestamps)
+    # Drop rows without a date-looking value up front, so only candidates get parsed
+    valid = np.ones(len(df), dtype=bool)
+    for col in ['start_time', 'end_time']:
+        if not pd.api.types.is_datetime64_any_dtype(df[col]):
+            if pd.api.types.is_string_dtype(df[col]):
+                valid &= df[col].str.match(DATE_PATTERN, na=False).to_numpy(dtype=bool)
+            else:
+                # Empty (null-typed) or non-string columns: nothing to regex
+                valid &= df[col].notna().to_numpy(dtype=bool)
+    df = df.loc[valid].copy()
+    for col in ['start_time', 'end_time']:
+        if not pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = parse_times(df[col])
+
+    # Drop rows that looked like dates but still failed to parse (e.g. 31/02)
+    bad = df['start_time'].isna() | df['end_time'].isna()
+    if bad.any():
+        df = df.loc[~bad]
+
+    # Data Enrichment
+    # Ensure machine_id is string and handle duplicates/formatting
+    # (Arrow string columns strip the prefix natively; numeric IDs just need a cast)
+    if pd.api.types.is_string_dtype(df['machine_id']):
+        df['machine_id'] = df['machine_id'].str.removeprefix('Machine ')
+    else:
+        df['machine_id'] = df['machine_id'].astype(str)
+
+    # Low-cardinality labels: store as category codes instead of strings
+    df['activity_type'] = df['activity_type'].astype('category')
+    df['machine_id'] = df['machine_id'].astype('category')
+    # Renaming touches only the handful of categories, not every row
+    df['machine_label'] = df['machine_id'].cat.rename_categories(lambda c: f"Machine {c}")
+    
+    # Calculate Duration
+    ns = (df['end_time'].to_numpy('datetime64[ns]').view('i8')
+          - df['start_time'].to_numpy('datetime64[ns]').view('i8'))
+    df['duration_hrs'] = ns * (1.0 / 3.6e12)
+    df['duration_min'] = ns * (1.0 / 6.0e10)
+    
+    return df
+
+def load_data():
+    try:
+        raw = fetch_csv()
+        return transform(raw, hashlib.blake2b(raw).hexdigest())
+    except Exception as e:
+        st.error(f"Data Error: {e}")
+        return pd.DataFrame()
@@ -0,0 +1,74 @@
+import json
+from unittest import mock
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import data
+
+# pyarrow reads these as timestamp[s][pyarrow] rather than strings
+ISO_CSV = b"""Timestamp,Start Time,End Time,Machine ID,Activity Type,Remark,Submitted By
+2026-10-15 09:00:00,2026-10-15 09:00:00,2026-10-15 10:00:00,Machine 1,Running,ok,ali
+2026-10-15 10:00:00,2026-10-15 10:00:00,2026-10-15 11:30:00,Machine 1,Running,ok,ali
+2026-10-15 11:30:00,2026-10-15 11:30:00,2026-10-15 12:00:00,Machine 2,Setup,,sara
+"""
+
+# The 09:15-09:30 bar sits inside 09:00-11:00, so 10:30-12:00 still overlaps the run
+NESTED_CSV = b"""Timestamp,Start Time,End Time,Machine ID,Activity Type,Remark,Submitted By
+15/10/2026 09:00:00,15/10/2026 09:00:00,15/10/2026 11:00:00,Machine 1,Running,a,ali
+15/10/2026 09:15:00,15/10/2026 09:15:00,15/10/2026 09:30:00,Machine 1,Running,b,ali
+15/10/2026 10:30:00,15/10/2026 10:30:00,15/10/2026 12:00:00,Machine 1,Running,c,ali
+"""
+
+
+@pytest.fixture(autouse=True)
+def fresh_caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(data, "PARQUET_CACHE", str(tmp_path / "cache.parquet"))
+    monkeypatch.setattr(data, "PARQUET_META", str(tmp_path / "cache.meta"))
+    st.cache_data.clear()
+    yield
+    st.cache_data.clear()
+
+
+def run_app(csv):
+    resp = mock.Mock(content=csv)
+    with mock.patch.object(data.requests, "get", return_value=resp):
+        at = AppTest.from_file("../app.py", default_timeout=60)
+        at.run()
+    return at
+
+
+def timeline_bars(at):
+    spec = json.loads(at.get("plotly_chart")[0].proto.spec)
+    return sum(len(trace["base"]) for trace in spec["data"])
+
+
+def test_iso_timestamps_render_timeline():
+    at = run_app(ISO_CSV)
+    assert not at.exception
+    # Running and Setup are billable by default: 2.5h * 5000 + 0.5h * 3500
+    assert at.metric[0].value == "PKR 14,250"
+    assert timeline_bars(at) == 2
+
+
+def test_nested_bars_coalesce_into_one():
+    at = run_app(NESTED_CSV)
+    assert not at.exception
+    assert timeline_bars(at) == 1
+
+
+def test_header_only_sheet_waits_for_data():
+    at = run_app(b"Timestamp,Start Time,End Time,Machine ID,Activity Type,Remark,Submitted By\n")
+    assert not at.exception
+    assert not at.error
+    assert at.info[0].value.startswith("Waiting for data")
+
+
+def test_parquet_cache_restores_parsed_sheet():
+    first = run_app(ISO_CSV)
+    st.cache_data.clear()  # simulate a restart: only the on-disk cache survives
+    with mock.patch.object(data, "parse_csv", side_effect=AssertionError("re-parsed")):
+        second = run_app(ISO_CSV)
+    assert not second.exception
+    assert [m.value for m in second.metric] == [m.value for m in first.metric]